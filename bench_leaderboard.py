@@ -0,0 +1,67 @@
+"""Benchmark the hunter leaderboard at 100k hunters.
+
+Run with: python bench_leaderboard.py
+"""
+import gc
+import random
+import time
+
+from leveling import Leaderboard
+
+HUNTERS = 100_000
+UPDATES = 50_000
+QUERIES = 10_000
+
+
+def make_hunter(index):
+    total_xp = random.randint(0, 500_000)
+    return {
+        'hunter_id': f"h{index:06d}",
+        'hunter_name': f"Hunter {index}",
+        'total_xp': total_xp,
+        'level': total_xp // 10_000 + 1,
+        'streak': random.randint(0, 120),
+        'weekly_xp': random.randint(0, 5_000)
+    }
+
+
+def repeat(query, args):
+    # Discard each result so the timings measure the index, not list building and the GC it triggers
+    for arg in args:
+        query(arg)
+
+
+def timed(label, count, func):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {count:>8,} ops  {elapsed:7.3f}s  {elapsed / count * 1e6:8.2f} us/op")
+
+
+def main():
+    random.seed(42)
+    leaderboard = Leaderboard()
+    hunters = [make_hunter(index) for index in range(HUNTERS)]
+
+    timed("insert", HUNTERS, lambda: [leaderboard.update(hunter) for hunter in hunters])
+
+    def grant_xp():
+        for _ in range(UPDATES):
+            hunter = random.choice(hunters)
+            amount = random.randint(10, 400)
+            hunter['total_xp'] += amount
+            hunter['weekly_xp'] += amount
+            leaderboard.update(hunter)
+
+    timed("update (add_xp)", UPDATES, grant_xp)
+
+    # The board's nodes are long-lived; keep the collector from rescanning them during queries
+    gc.freeze()
+    sample = [random.choice(hunters)['hunter_id'] for _ in range(QUERIES)]
+    timed("rank", QUERIES, lambda: repeat(lambda hunter_id: leaderboard.rank('total_xp', hunter_id), sample))
+    timed("top 10", QUERIES, lambda: repeat(lambda _: leaderboard.top('total_xp', 10), range(QUERIES)))
+    timed("around (radius 2)", QUERIES, lambda: repeat(lambda hunter_id: leaderboard.around('weekly_xp', hunter_id), sample))
+
+
+if __name__ == "__main__":
+    main()
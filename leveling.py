@@ -1,11 +1,26 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import json
+import logging
+import os
+import re
 from pathlib import Path
+from types import MappingProxyType
 import random
+import numpy as np
+import atexit
+import threading
+import time
+import uuid
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from simulator import KCAL_PER_KG, TARGET_BODY_FAT, simulate_paths
+
+logger = logging.getLogger(__name__)
 
 # Configure Streamlit page
 st.set_page_config(
@@ -71,18 +86,25 @@ st.markdown("""
 # Initialize session state
 def initialize_session_state():
     if 'hunter_data' not in st.session_state:
+        hunter_id = uuid.uuid4().hex[:12]
         st.session_state.hunter_data = {
+            'hunter_id': hunter_id,
+            'hunter_name': f"Hunter {hunter_id[:4].upper()}",
             'level': 1,
             'xp': 0,
             'total_xp': 0,
+            'weekly_xp': 0,
+            'week_start': str(current_week_start()),
             'workouts_completed': 0,
             'exercises_completed': 0,
             'days_active': 0,
             'streak': 0,
             'current_weight': 78.7,
             'body_fat': 29.2,
+            'goal': 'cut',
             'start_date': datetime.now().strftime('%Y-%m-%d'),
-            'last_active': None
+            'last_active': None,
+            'weight_log': []
         }
     
     if 'nutrition_data' not in st.session_state:
@@ -92,6 +114,8 @@ def initialize_session_state():
             'daily_carbs': 0,
             'daily_fats': 0,
             'food_log': [],
+            'history': [],
+            'food_index': {},
             'last_reset': datetime.now().date()
         }
     
@@ -115,35 +139,237 @@ def initialize_session_state():
             'level_10': False,
             'shredded_goal': False
         }
+    
+    if 'recipe_book' not in st.session_state:
+        st.session_state.recipe_book = {
+            'ingredients': {},
+            'recipes': {}
+        }
+    
+    if 'undo_history' not in st.session_state:
+        st.session_state.undo_history = {
+            'snapshots': [],
+            'position': 0,
+            'clean_exit': False
+        }
+    
+    # Actions queued during the current rerun, and feedback shown after they commit
+    if 'action_queue' not in st.session_state:
+        st.session_state.action_queue = []
+    
+    if 'action_feedback' not in st.session_state:
+        st.session_state.action_feedback = {'messages': [], 'celebrate': False}
+    
+    # Memoised per-serving macros, keyed by recipe name
+    if 'recipe_macros' not in st.session_state:
+        st.session_state.recipe_macros = {}
 
 def calculate_xp_for_level(level):
     return level * 1000
 
-def check_level_up():
-    current_level = st.session_state.hunter_data['level']
-    current_xp = st.session_state.hunter_data['xp']
+def check_level_up(hunter_data):
+    current_level = hunter_data['level']
+    current_xp = hunter_data['xp']
     xp_needed = calculate_xp_for_level(current_level)
     
-    if current_xp >= xp_needed:
-        st.session_state.hunter_data['level'] += 1
-        st.session_state.hunter_data['xp'] = current_xp - xp_needed
+    levelled_up = False
+    while current_xp >= xp_needed:
+        hunter_data['level'] += 1
+        current_xp -= xp_needed
+        hunter_data['xp'] = current_xp
+        xp_needed = calculate_xp_for_level(hunter_data['level'])
+        levelled_up = True
+    return levelled_up
+
+def current_week_start():
+    today = datetime.now().date()
+    return today - timedelta(days=today.weekday())
+
+def roll_weekly_xp(hunter_data):
+    """Zero the hunter's weekly XP once a new week has started"""
+    week_start = str(current_week_start())
+    if hunter_data.get('week_start') != week_start:
+        hunter_data['weekly_xp'] = 0
+        hunter_data['week_start'] = week_start
         return True
     return False
 
-def add_xp(amount):
-    st.session_state.hunter_data['xp'] += amount
-    st.session_state.hunter_data['total_xp'] += amount
+def grant_xp(hunter_data, amount):
+    """Add XP to a hunter's data dict and return True if they levelled up"""
+    roll_weekly_xp(hunter_data)
+    hunter_data['xp'] += amount
+    hunter_data['total_xp'] += amount
+    hunter_data['weekly_xp'] += amount
+    levelled_up = check_level_up(hunter_data)
+    get_leaderboard().sync(hunter_data)
+    return levelled_up
+
+# Action dispatcher: widget callbacks queue actions and they are committed once at the start
+# of the rerun the interaction triggers, so every click renders exactly once
+ACTION_KEY_RETENTION_DAYS = 7
+
+def dispatch(action, scope=None, mutate=None, args=(), xp=0, message=None):
+    """Queue a user action; scoped actions (e.g. per day or exercise) only ever apply once.
+    
+    Returns False if an action with the same idempotency key was already applied or queued.
+    """
+    key = f"{st.session_state.hunter_data['hunter_id']}:{action}:{scope}" if scope is not None else None
+    queue = st.session_state.action_queue
+    if key is not None and (
+        key in st.session_state.hunter_data.get('action_keys', {}) or any(item['key'] == key for item in queue)
+    ):
+        return False
+    queue.append({'key': key, 'mutate': mutate, 'args': args, 'xp': xp, 'message': message})
+    return True
+
+def notify(message):
+    """Show a message as a toast on the next render"""
+    st.session_state.action_feedback['messages'].append(message)
+
+def commit_actions():
+    """Apply every queued action as one batch with a single XP grant and level-up check"""
+    queue = st.session_state.action_queue
+    if not queue:
+        return False
     
-    if check_level_up():
-        st.success(f"🎉 LEVEL UP! You are now Hunter Level {st.session_state.hunter_data['level']}!")
-        st.balloons()
+    hunter_data = st.session_state.hunter_data
+    feedback = st.session_state.action_feedback
+    action_keys = hunter_data.setdefault('action_keys', {})
+    today = str(datetime.now().date())
+    total_xp = 0
+    for item in queue:
+        if item['mutate'] is not None:
+            item['mutate'](*item['args'])
+        if item['key'] is not None:
+            action_keys[item['key']] = today
+        if item['message']:
+            feedback['messages'].append(item['message'])
+        total_xp += item['xp']
+    queue.clear()
+    
+    # Keys are scoped to a day or exercise, so old ones can never be dispatched again
+    cutoff = str(datetime.now().date() - timedelta(days=ACTION_KEY_RETENTION_DAYS))
+    for key in [key for key, day in action_keys.items() if day < cutoff]:
+        del action_keys[key]
+    
+    if total_xp and grant_xp(hunter_data, total_xp):
+        feedback['messages'].append(f"🎉 LEVEL UP! You are now Hunter Level {hunter_data['level']}!")
+        feedback['celebrate'] = True
+    return True
+
+def mark_quest_complete(quest_key):
+    st.session_state.workout_data.setdefault(quest_key, {'completed': False, 'exercises': []})['completed'] = True
+
+def mark_exercise_complete(quest_key, exercise_key):
+    quest = st.session_state.workout_data.setdefault(quest_key, {'completed': False, 'exercises': []})
+    if exercise_key not in quest['exercises']:
+        quest['exercises'].append(exercise_key)
+
+def complete_quest(quest_key):
+    mark_quest_complete(quest_key)
+    st.session_state.hunter_data['workouts_completed'] += 1
+
+def complete_exercise(quest_key, exercise_key):
+    mark_exercise_complete(quest_key, exercise_key)
+    st.session_state.hunter_data['exercises_completed'] += 1
+
+def request_quest(quest_key, xp):
+    if st.session_state.workout_data.get(quest_key, {}).get('completed', False):
+        notify("⚠️ Quest already completed today!")
+    elif not dispatch(
+        'complete_quest', f"{datetime.now().date()}:{quest_key}", complete_quest, (quest_key,),
+        xp=xp, message=f"🎉 Quest Complete! +{xp} XP earned!"
+    ):
+        # Cleared by a weekly reset after its XP was granted: tick it again without XP
+        dispatch('mark_quest_complete', mutate=mark_quest_complete, args=(quest_key,), message="✅ Quest marked complete (XP already earned today)")
+
+def request_exercise(quest_key, exercise_key, xp, message):
+    if exercise_key in st.session_state.workout_data.get(quest_key, {}).get('exercises', []):
+        return
+    if not dispatch(
+        'complete_exercise', f"{datetime.now().date()}:{exercise_key}", complete_exercise,
+        (quest_key, exercise_key), xp=xp, message=message
+    ):
+        dispatch('mark_exercise_complete', mutate=mark_exercise_complete, args=(quest_key, exercise_key))
+
+def request_rest_day():
+    # Small XP for consistency, once per rest day
+    if not dispatch('log_rest_day', str(datetime.now().date()), xp=50, message="🎉 Rest day logged! +50 XP for consistency!"):
+        notify("⚠️ Rest day already logged today!")
+
+def request_day_active():
+    today = datetime.now().strftime('%Y-%m-%d')
+    if st.session_state.hunter_data['last_active'] == today or not dispatch(
+        'mark_day_active', today, mark_day_active, (today,), xp=25, message="✅ Day marked as active! +25 XP"
+    ):
+        notify("⚠️ Already marked active today!")
+
+def mark_day_active(today):
+    st.session_state.hunter_data['days_active'] += 1
+    st.session_state.hunter_data['streak'] += 1
+    st.session_state.hunter_data['last_active'] = today
+
+def reset_weekly_progress():
+    # Only the checkmarks are cleared; action keys stay so a reset can't earn the same XP twice
+    for day in st.session_state.workout_data:
+        if day != 'last_reset':
+            st.session_state.workout_data[day] = {'completed': False, 'exercises': []}
+
+def update_body_stat(field, value):
+    st.session_state.hunter_data[field] = value
+    record_weigh_in()
+
+def request_body_stat(field, widget_key, message):
+    dispatch(f"update_{field}", mutate=update_body_stat, args=(field, st.session_state[widget_key]), message=message)
+
+def set_goal(goal):
+    st.session_state.hunter_data['goal'] = goal
+    update_macro_targets(st.session_state, force=True)
 
-def reset_daily_data():
+def request_goal():
+    goal = st.session_state.macro_goal
+    if goal != st.session_state.hunter_data.get('goal', 'cut'):
+        dispatch('set_goal', mutate=set_goal, args=(goal,), message=f"🎯 Goal set to {MACRO_GOALS[goal]['label']}")
+
+def set_hunter_name(name):
+    st.session_state.hunter_data['hunter_name'] = name
+    get_leaderboard().sync(st.session_state.hunter_data)
+
+def request_hunter_name():
+    name = st.session_state.hunter_name_input
+    if name and name != st.session_state.hunter_data['hunter_name']:
+        dispatch('set_hunter_name', mutate=set_hunter_name, args=(name,))
+
+# Widgets mirroring stored values; dropped when the state is replaced so they show the new values
+STATE_WIDGET_KEYS = ('macro_goal', 'hunter_name_input', 'new_weight', 'new_body_fat')
+
+def reset_state_widgets():
+    for key in STATE_WIDGET_KEYS:
+        st.session_state.pop(key, None)
+
+# Background housekeeping settings
+HISTORY_DETAIL_DAYS = 28
+SESSION_IDLE_TIMEOUT = 6 * 60 * 60
+STATE_KEYS = ('hunter_data', 'nutrition_data', 'workout_data', 'achievements', 'recipe_book')
+
+def reset_daily_data(entry):
+    """Roll over daily/weekly progress; cheap enough to run at the start of every rerun"""
     today = datetime.now().date()
-    
-    # Reset nutrition data if it's a new day
-    if st.session_state.nutrition_data['last_reset'] != today:
-        st.session_state.nutrition_data.update({
+    nutrition_data = entry['nutrition_data']
+    workout_data = entry['workout_data']
+    
+    # Reset nutrition data if it's a new day, archiving yesterday's totals
+    if nutrition_data['last_reset'] != today:
+        if nutrition_data['food_log']:
+            nutrition_data.setdefault('history', []).append({
+                'date': str(nutrition_data['last_reset']),
+                'calories': nutrition_data['daily_calories'],
+                'protein': nutrition_data['daily_protein'],
+                'carbs': nutrition_data['daily_carbs'],
+                'fats': nutrition_data['daily_fats'],
+                'entries': len(nutrition_data['food_log'])
+            })
+        nutrition_data.update({
             'daily_calories': 0,
             'daily_protein': 0,
             'daily_carbs': 0,
@@ -152,136 +378,877 @@ def reset_daily_data():
             'last_reset': today
         })
     
+    if roll_weekly_xp(entry['hunter_data']):
+        get_leaderboard().sync(entry['hunter_data'])
+    
     # Reset workout data if it's a new week (Monday)
-    if today.weekday() == 0 and st.session_state.workout_data['last_reset'] != today:
-        for day in st.session_state.workout_data:
+    if today.weekday() == 0 and workout_data['last_reset'] != today:
+        for day in workout_data:
             if day != 'last_reset':
-                st.session_state.workout_data[day] = {'completed': False, 'exercises': []}
-        st.session_state.workout_data['last_reset'] = today
+                workout_data[day] = {'completed': False, 'exercises': []}
+        workout_data['last_reset'] = today
+
+# Weekly workout schedule
+WORKOUT_SCHEDULE = {
+    'Monday': {'type': 'rest', 'name': '😴 REST DAY', 'xp': 0, 'exercises': []},
+    'Tuesday': {
+        'type': 'pull', 
+        'name': '🗡️ PULL QUEST (No Assisted Pull-ups)', 
+        'xp': 150,
+        'exercises': [
+            {'name': 'Lat Pulldowns', 'sets': 4, 'reps': '8-12', 'rest': '90s', 'xp': 30},
+            {'name': 'Cable Rows', 'sets': 4, 'reps': '8-12', 'rest': '90s', 'xp': 30},
+            {'name': 'Cable Bicep Curls', 'sets': 3, 'reps': '10-15', 'rest': '60s', 'xp': 25},
+            {'name': 'Reverse Grip Curls', 'sets': 3, 'reps': '12-15', 'rest': '60s', 'xp': 20}
+        ]
+    },
+    'Wednesday': {
+        'type': 'push', 
+        'name': '🛡️ PUSH QUEST', 
+        'xp': 150,
+        'exercises': [
+            {'name': 'Chest Press', 'sets': 4, 'reps': '8-12', 'rest': '90s', 'xp': 35},
+            {'name': 'Shoulder Press Machine', 'sets': 4, 'reps': '8-12', 'rest': '90s', 'xp': 30},
+            {'name': 'Tricep Pulldowns', 'sets': 3, 'reps': '10-15', 'rest': '60s', 'xp': 25},
+            {'name': 'Push-ups (Progression)', 'sets': 2, 'reps': 'Max', 'rest': '60s', 'xp': 20}
+        ]
+    },
+    'Thursday': {
+        'type': 'legs', 
+        'name': '🦵 LEG QUEST + CORE', 
+        'xp': 200,
+        'exercises': [
+            {'name': 'Leg Press', 'sets': 4, 'reps': '12-20', 'rest': '2min', 'xp': 50},
+            {'name': 'Seated Calf Raises', 'sets': 4, 'reps': '15-20', 'rest': '60s', 'xp': 25},
+            {'name': 'Plank Hold', 'sets': 3, 'reps': '30-60s', 'rest': '60s', 'xp': 30},
+            {'name': 'Kettlebell Swings', 'sets': 3, 'reps': '15-20', 'rest': '90s', 'xp': 35}
+        ]
+    },
+    'Friday': {
+        'type': 'push', 
+        'name': '🛡️ PUSH QUEST (Repeat)', 
+        'xp': 150,
+        'exercises': [
+            {'name': 'Same as Wednesday', 'sets': '-', 'reps': '-', 'rest': '-', 'xp': 110}
+        ]
+    },
+    'Saturday': {
+        'type': 'legendary', 
+        'name': '🔥 LEGENDARY PULL QUEST (Assisted Pull-ups!)', 
+        'xp': 250,
+        'exercises': [
+            {'name': '🏆 ASSISTED PULL-UPS (LEGENDARY)', 'sets': 4, 'reps': '5-8', 'rest': '2min', 'xp': 100},
+            {'name': 'Lat Pulldowns (Light)', 'sets': 3, 'reps': '8-12', 'rest': '90s', 'xp': 25},
+            {'name': 'Cable Bicep Curls', 'sets': 3, 'reps': '10-15', 'rest': '60s', 'xp': 25}
+        ]
+    },
+    'Sunday': {
+        'type': 'legs', 
+        'name': '🦵 LEG QUEST + CORE (Repeat)', 
+        'xp': 200,
+        'exercises': [
+            {'name': 'Same as Thursday', 'sets': '-', 'reps': '-', 'rest': '-', 'xp': 140}
+        ]
+    }
+}
+
+# Adaptive macro-target engine
+MACRO_GOALS = {
+    'cut': {'label': '🔥 Cut (Fat Loss)', 'calorie_offset': -500},
+    'maintain': {'label': '⚖️ Maintain', 'calorie_offset': 0},
+    'lean_bulk': {'label': '💪 Lean Bulk', 'calorie_offset': 250}
+}
+# Starting maintenance estimate before there is enough data. At the default 78.7 kg on a cut this
+# gives 1790 kcal / 157 P / 178 C / 50 F, the old fixed plan with carbs balanced to the calories
+TDEE_PER_KG = 29.1
+TDEE_WINDOW_DAYS = 21
+TDEE_MIN_INTAKE_DAYS = 7
+TDEE_SMOOTHING = 0.25  # Share of each day's regression estimate blended into the running TDEE
+PROTEIN_PER_KG = 2.0
+FATS_PER_KG = 0.64
+
+def estimate_tdee(hunter_data, nutrition_data):
+    """Regress weight over the recent window against logged intake; None if there isn't enough data"""
+    cutoff = str(datetime.now().date() - timedelta(days=TDEE_WINDOW_DAYS))
+    intake = [day['calories'] for day in nutrition_data.get('history', []) if day.get('date', '') >= cutoff]
+    weigh_ins = [entry for entry in hunter_data.get('weight_log', []) if entry['date'] >= cutoff]
+    if len(intake) < TDEE_MIN_INTAKE_DAYS or len(weigh_ins) < 2:
+        return None
+    
+    dates = [datetime.strptime(entry['date'], '%Y-%m-%d') for entry in weigh_ins]
+    offsets = [(date - dates[0]).days for date in dates]
+    if offsets[-1] < 7:
+        return None
+    
+    weight_slope = np.polyfit(offsets, [entry['weight'] for entry in weigh_ins], 1)[0]
+    return float(np.mean(intake) - weight_slope * KCAL_PER_KG)
+
+def update_macro_targets(entry, force=False):
+    """Refresh the cached TDEE and macro targets at most once per day (or when forced)"""
+    hunter_data = entry['hunter_data']
+    nutrition_data = entry['nutrition_data']
+    today = str(datetime.now().date())
+    engine = nutrition_data.get('macro_engine')
+    if engine and engine['date'] == today and not force:
+        return engine['targets']
+    
+    weight = hunter_data['current_weight']
+    previous_tdee = engine['tdee'] if engine else weight * TDEE_PER_KG
+    if engine and engine['date'] == today:
+        tdee, source = previous_tdee, engine['source']
+    else:
+        estimate = estimate_tdee(hunter_data, nutrition_data)
+        if estimate is None and engine:
+            # Keep what has been learned through gaps in logging or weigh-ins
+            tdee, source = previous_tdee, engine['source']
+        elif estimate is None:
+            tdee, source = weight * TDEE_PER_KG, 'estimate'
+        else:
+            tdee, source = previous_tdee + TDEE_SMOOTHING * (estimate - previous_tdee), 'trend'
+        tdee = min(max(tdee, 1200.0), 4500.0)
+    
+    goal = MACRO_GOALS[hunter_data.get('goal', 'cut')]
+    calories = round(tdee + goal['calorie_offset'])
+    protein = round(weight * PROTEIN_PER_KG)
+    fats = round(weight * FATS_PER_KG)
+    carbs = max(round((calories - protein * 4 - fats * 9) / 4), 0)
+    
+    nutrition_data['macro_engine'] = {
+        'date': today,
+        'tdee': tdee,
+        'source': source,
+        'targets': {'calories': calories, 'protein': protein, 'carbs': carbs, 'fats': fats}
+    }
+    return nutrition_data['macro_engine']['targets']
+
+def get_macro_targets():
+    return update_macro_targets(st.session_state)
+
+# Achievement definitions, evaluated against hunter_data
+ACHIEVEMENTS = {
+    'first_workout': {
+        'name': '🎯 First Quest Complete',
+        'description': 'Complete your first workout',
+        'condition': lambda hunter: hunter['workouts_completed'] >= 1,
+        'xp_reward': 100
+    },
+    'week_streak': {
+        'name': '🔥 Week Warrior',
+        'description': 'Maintain a 7-day streak',
+        'condition': lambda hunter: hunter['streak'] >= 7,
+        'xp_reward': 500
+    },
+    'month_streak': {
+        'name': '⚡ Monthly Master',
+        'description': 'Maintain a 30-day streak',
+        'condition': lambda hunter: hunter['streak'] >= 30,
+        'xp_reward': 2000
+    },
+    'first_pullup': {
+        'name': '💪 Pull-up Pioneer',
+        'description': 'Complete 10 assisted pull-up sessions',
+        'condition': lambda hunter: hunter['exercises_completed'] >= 40,  # Rough estimate
+        'xp_reward': 750
+    },
+    'level_10': {
+        'name': '🌟 Elite Hunter',
+        'description': 'Reach Hunter Level 10',
+        'condition': lambda hunter: hunter['level'] >= 10,
+        'xp_reward': 1000
+    },
+    'shredded_goal': {
+        'name': '🏆 Shredded Awakening',
+        'description': 'Reach 12% body fat or lower',
+        'condition': lambda hunter: hunter['body_fat'] <= 12.0,
+        'xp_reward': 5000
+    }
+}
+
+def check_achievements(entry):
+    """Unlock achievements whose condition is met and queue notices for the hunter"""
+    hunter_data = entry['hunter_data']
+    for achievement_key, achievement in ACHIEVEMENTS.items():
+        if achievement['condition'](hunter_data) and not entry['achievements'].get(achievement_key):
+            entry['achievements'][achievement_key] = True
+            entry['notices'].append(f"🎉 Achievement Unlocked: {achievement['name']}! +{achievement['xp_reward']} XP!")
+            if grant_xp(hunter_data, achievement['xp_reward']):
+                entry['notices'].append(f"🎉 LEVEL UP! You are now Hunter Level {hunter_data['level']}!")
+
+def refresh_analytics(entry):
+    """Recompute rolling intake and training averages for the stats dashboard"""
+    history = [day for day in entry['nutrition_data'].get('history', []) if 'date' in day]
+    recent = history[-7:]
+    days_logged = len(recent)
+    entry['analytics'] = {
+        'days_logged': days_logged,
+        'avg_calories': sum(day['calories'] for day in recent) / days_logged if days_logged else 0,
+        'avg_protein': sum(day['protein'] for day in recent) / days_logged if days_logged else 0,
+        'updated': datetime.now().strftime('%H:%M:%S')
+    }
+
+def roll_weekly_board(entry):
+    """Zero last week's XP on the board at the week boundary, not on each hunter's next visit"""
+    if roll_weekly_xp(entry['hunter_data']):
+        get_leaderboard().sync(entry['hunter_data'])
+
+def compact_history(entry):
+    """Merge daily intake summaries older than HISTORY_DETAIL_DAYS into weekly summaries"""
+    history = entry['nutrition_data'].get('history', [])
+    cutoff = datetime.now().date() - timedelta(days=HISTORY_DETAIL_DAYS)
+    weeks = {}
+    compacted = []
+    
+    for day in history:
+        if 'date' not in day or datetime.strptime(day['date'], '%Y-%m-%d').date() >= cutoff:
+            compacted.append(day)
+            continue
+        
+        date = datetime.strptime(day['date'], '%Y-%m-%d').date()
+        week_start = str(date - timedelta(days=date.weekday()))
+        if week_start not in weeks:
+            weeks[week_start] = {'week': week_start, 'days': 0, 'calories': 0, 'protein': 0, 'carbs': 0, 'fats': 0, 'entries': 0}
+        week = weeks[week_start]
+        week['days'] += 1
+        for field in ('calories', 'protein', 'carbs', 'fats', 'entries'):
+            week[field] += day[field]
+    
+    if weeks:
+        # Fold into any weekly summaries already compacted on an earlier run
+        for summary in compacted:
+            if 'week' in summary and summary['week'] in weeks:
+                week = weeks.pop(summary['week'])
+                for field in ('days', 'calories', 'protein', 'carbs', 'fats', 'entries'):
+                    summary[field] += week[field]
+        entry['nutrition_data']['history'] = sorted(
+            compacted + list(weeks.values()),
+            key=lambda item: item.get('week', item.get('date'))
+        )
+
+# Background job scheduler shared across sessions
+class BackgroundScheduler:
+    """Runs periodic housekeeping jobs for every registered hunter off the request path"""
+    
+    def __init__(self, max_workers=4, tick=1.0, on_prune=None):
+        self.hunters = {}
+        self.on_prune = on_prune
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self._jobs = {}
+        self._tick = tick
+        self._stop = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hunter-job')
+        self._thread = threading.Thread(target=self._loop, name='hunter-scheduler', daemon=True)
+        self._thread.start()
+    
+    def add_job(self, name, func, interval):
+        """Run func(entry) for every hunter once every interval seconds"""
+        with self.lock:
+            self._jobs[name] = {'func': func, 'interval': interval, 'next_run': time.monotonic() + interval}
+            self.metrics[name] = {'runs': 0, 'errors': 0, 'last_ms': 0.0, 'avg_ms': 0.0, 'max_ms': 0.0, 'last_run': None}
+    
+    def register(self, hunter_id, state):
+        """Register (or refresh) a hunter's state and return its registry entry"""
+        with self.lock:
+            entry = self.hunters.get(hunter_id)
+            if entry is None:
+                entry = {'lock': threading.RLock(), 'notices': [], 'analytics': {}}
+                self.hunters[hunter_id] = entry
+            entry.update({key: state[key] for key in STATE_KEYS})
+            entry['last_seen'] = time.monotonic()
+        return entry
+    
+    def submit(self, name, hunter_id=None):
+        """Queue a job to run now, for one hunter or all of them"""
+        if not self._stop.is_set():
+            self._executor.submit(self._run, name, hunter_id)
+    
+    def _run(self, name, hunter_id=None):
+        job = self._jobs[name]
+        with self.lock:
+            if hunter_id is None:
+                entries = list(self.hunters.values())
+            else:
+                entries = [self.hunters[hunter_id]] if hunter_id in self.hunters else []
+        
+        started = time.perf_counter()
+        failed = False
+        for entry in entries:
+            try:
+                with entry['lock']:
+                    job['func'](entry)
+            except Exception:
+                logger.exception("Background job %r failed", name)
+                failed = True
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        
+        with self.lock:
+            metrics = self.metrics[name]
+            metrics['runs'] += 1
+            metrics['errors'] += int(failed)
+            metrics['last_ms'] = elapsed_ms
+            metrics['avg_ms'] += (elapsed_ms - metrics['avg_ms']) / metrics['runs']
+            metrics['max_ms'] = max(metrics['max_ms'], elapsed_ms)
+            metrics['last_run'] = datetime.now().strftime('%H:%M:%S')
+    
+    def _prune_idle(self):
+        cutoff = time.monotonic() - SESSION_IDLE_TIMEOUT
+        with self.lock:
+            pruned = [key for key, entry in self.hunters.items() if entry['last_seen'] < cutoff]
+            for hunter_id in pruned:
+                del self.hunters[hunter_id]
+        if self.on_prune is not None:
+            for hunter_id in pruned:
+                self.on_prune(hunter_id)
+    
+    def _loop(self):
+        while not self._stop.wait(self._tick):
+            now = time.monotonic()
+            with self.lock:
+                due = [name for name, job in self._jobs.items() if job['next_run'] <= now]
+                for name in due:
+                    self._jobs[name]['next_run'] = now + self._jobs[name]['interval']
+            for name in due:
+                self.submit(name)
+            self._prune_idle()
+    
+    def shutdown(self):
+        """Stop scheduling new jobs and wait for running ones to finish"""
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+@st.cache_resource
+def get_scheduler():
+    # Hunters whose session has gone idle also leave the shared leaderboard
+    scheduler = BackgroundScheduler(on_prune=lambda hunter_id: get_leaderboard().remove(hunter_id))
+    scheduler.add_job('achievements', check_achievements, 30)
+    scheduler.add_job('weekly', roll_weekly_board, 60)
+    scheduler.add_job('targets', update_macro_targets, 600)
+    scheduler.add_job('analytics', refresh_analytics, 300)
+    scheduler.add_job('compaction', compact_history, 3600)
+    atexit.register(scheduler.shutdown)
+    return scheduler
+
+# Leaderboard shared across sessions
+LEADERBOARD_METRICS = {
+    'total_xp': 'Total XP',
+    'level': 'Level',
+    'streak': 'Streak',
+    'weekly_xp': 'Weekly XP'
+}
+SKIPLIST_MAX_LEVELS = 24
+
+class _SkipNode:
+    __slots__ = ('value', 'next', 'width')
+    
+    def __init__(self, value, levels):
+        self.value = value
+        self.next = [None] * levels
+        self.width = [1] * levels
+
+class IndexableSkipList:
+    """Sorted list with O(log n) insert, remove, rank and k-th element lookup"""
+    
+    def __init__(self):
+        self.size = 0
+        self.head = _SkipNode(None, SKIPLIST_MAX_LEVELS)
+    
+    def __len__(self):
+        return self.size
+    
+    def _find(self, value):
+        # Last node before value at each level, and that node's position
+        chain = [None] * SKIPLIST_MAX_LEVELS
+        positions = [0] * SKIPLIST_MAX_LEVELS
+        node, position = self.head, 0
+        for level in reversed(range(SKIPLIST_MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].value < value:
+                position += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+            positions[level] = position
+        return chain, positions
+    
+    def insert(self, value):
+        chain, positions = self._find(value)
+        levels = 1
+        while levels < SKIPLIST_MAX_LEVELS and random.random() < 0.5:
+            levels += 1
+        
+        new_node = _SkipNode(value, levels)
+        position = positions[0] + 1
+        for level in range(levels):
+            previous = chain[level]
+            new_node.next[level] = previous.next[level]
+            previous.next[level] = new_node
+            new_node.width[level] = previous.width[level] - (position - positions[level]) + 1
+            previous.width[level] = position - positions[level]
+        for level in range(levels, SKIPLIST_MAX_LEVELS):
+            chain[level].width[level] += 1
+        self.size += 1
+    
+    def remove(self, value):
+        chain, _ = self._find(value)
+        target = chain[0].next[0]
+        if target is None or target.value != value:
+            raise KeyError(value)
+        
+        for level in range(len(target.next)):
+            previous = chain[level]
+            previous.width[level] += target.width[level] - 1
+            previous.next[level] = target.next[level]
+        for level in range(len(target.next), SKIPLIST_MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self.size -= 1
+    
+    def rank(self, value):
+        """Number of elements strictly less than value"""
+        return self._find(value)[1][0]
+    
+    def _node_at(self, index):
+        node, remaining = self.head, index + 1
+        for level in reversed(range(SKIPLIST_MAX_LEVELS)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node
+    
+    def __getitem__(self, index):
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        return self._node_at(index).value
+    
+    def slice(self, start, stop):
+        """Elements start..stop-1, found in O(log n) and then walked along the bottom level"""
+        start, stop = max(start, 0), min(stop, self.size)
+        values = []
+        if start < stop:
+            node = self._node_at(start)
+            while node is not None and len(values) < stop - start:
+                values.append(node.value)
+                node = node.next[0]
+        return values
+
+class Leaderboard:
+    """Ranks hunters by each LEADERBOARD_METRICS field, updated incrementally on every XP grant"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hunters = {}
+        self.indexes = {metric: IndexableSkipList() for metric in LEADERBOARD_METRICS}
+    
+    def __len__(self):
+        return len(self.hunters)
+    
+    def update(self, hunter_data):
+        hunter_id = hunter_data['hunter_id']
+        with self.lock:
+            previous = self.hunters.get(hunter_id)
+            for metric, index in self.indexes.items():
+                value = hunter_data.get(metric, 0)
+                if previous is not None:
+                    if previous[metric] == value:
+                        continue
+                    index.remove((-previous[metric], hunter_id))
+                index.insert((-value, hunter_id))
+            self.hunters[hunter_id] = {'name': hunter_data.get('hunter_name', hunter_id), **{
+                metric: hunter_data.get(metric, 0) for metric in LEADERBOARD_METRICS
+            }}
+    
+    def remove(self, hunter_id):
+        with self.lock:
+            previous = self.hunters.pop(hunter_id, None)
+            if previous is not None:
+                for metric, index in self.indexes.items():
+                    index.remove((-previous[metric], hunter_id))
+    
+    def sync(self, hunter_data):
+        """Rank hunters once they have earned XP; anonymous 0-XP sessions stay off the board"""
+        if hunter_data.get('total_xp', 0) > 0:
+            self.update(hunter_data)
+        else:
+            self.remove(hunter_data['hunter_id'])
+    
+    def _rows(self, metric, start, stop):
+        return [
+            {'rank': start + offset + 1, 'hunter_id': hunter_id, 'name': self.hunters[hunter_id]['name'], 'value': -value}
+            for offset, (value, hunter_id) in enumerate(self.indexes[metric].slice(start, stop))
+        ]
+    
+    def rank(self, metric, hunter_id):
+        """1-based rank of a hunter, or None if they are not on the board"""
+        with self.lock:
+            if hunter_id not in self.hunters:
+                return None
+            return self.indexes[metric].rank((-self.hunters[hunter_id][metric], hunter_id)) + 1
+    
+    def top(self, metric, k=10):
+        with self.lock:
+            return self._rows(metric, 0, k)
+    
+    def around(self, metric, hunter_id, radius=2):
+        """Hunters ranked within radius places of the given hunter"""
+        with self.lock:
+            if hunter_id not in self.hunters:
+                return []
+            position = self.indexes[metric].rank((-self.hunters[hunter_id][metric], hunter_id))
+            return self._rows(metric, max(0, position - radius), position + radius + 1)
+
+@st.cache_resource
+def get_leaderboard():
+    return Leaderboard()
+
+# Transformation simulator settings
+SIMULATION_PATHS = 100_000
+SIMULATION_DAYS = 182
+SIMULATION_WORKERS = min(os.cpu_count() or 1, 4)
+SIMULATION_PERCENTILES = (10, 25, 50, 75, 90)
+
+def build_simulation_inputs():
+    """Summarise the hunter's adherence, intake and weigh-ins as simulator inputs.
+    
+    Inputs only change once per day or on a body-stat update, so XP-granting actions don't miss
+    the simulation cache; current XP and level are applied to the cached bands afterwards.
+    """
+    hunter_data = st.session_state.hunter_data
+    nutrition_data = st.session_state.nutrition_data
+    workout_data = st.session_state.workout_data
+    today = datetime.now()
+    days = list(WORKOUT_SCHEDULE)
+    
+    # Quest adherence this week up to yesterday, as a Beta posterior on a 75% prior
+    completed = missed = 0
+    for day in days[:today.weekday()]:
+        workout = WORKOUT_SCHEDULE[day]
+        if workout['type'] == 'rest':
+            continue
+        if workout_data.get(f"{day.lower()}_{workout['type']}", {}).get('completed', False):
+            completed += 1
+        else:
+            missed += 1
+    
+    # XP on offer each weekday (Monday = 0), rest days count the rest-day log
+    daily_xp = [
+        WORKOUT_SCHEDULE[day]['xp'] + sum(ex['xp'] for ex in WORKOUT_SCHEDULE[day]['exercises'])
+        if WORKOUT_SCHEDULE[day]['type'] != 'rest' else 50
+        for day in days
+    ]
+    training_days = [WORKOUT_SCHEDULE[day]['type'] != 'rest' for day in days]
+    
+    # Intake from recent daily history, falling back to the targets
+    targets = get_macro_targets()
+    recent = [day for day in nutrition_data.get('history', []) if 'date' in day][-14:]
+    if len(recent) >= 2:
+        intake_mean = float(np.mean([day['calories'] for day in recent]))
+        intake_sd = max(float(np.std([day['calories'] for day in recent])), 100.0)
+        entries_per_day = float(np.mean([day['entries'] for day in recent]))
+    else:
+        intake_mean, intake_sd, entries_per_day = float(targets['calories']), 250.0, 4.0
+    
+    return {
+        'weight': hunter_data['current_weight'],
+        'body_fat': hunter_data['body_fat'],
+        'adherence_a': 3 + completed,
+        'adherence_b': 1 + missed,
+        'daily_xp': daily_xp,
+        'training_days': training_days,
+        'start_weekday': today.weekday(),
+        'intake_mean': intake_mean,
+        'intake_sd': intake_sd,
+        'food_xp': 10 * entries_per_day,
+        # Same maintenance estimate the macro targets use
+        'tdee': nutrition_data['macro_engine']['tdee']
+    }
+
+# Workers start from a fork server (or spawn) rather than forking the threaded app server.
+# They load this script as __mp_main__, where main() doesn't run, and unpickle the
+# simulation from the importable simulator module
+@st.cache_resource
+def get_simulation_pool():
+    """One process pool shared by every session, started once and reused across runs"""
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    pool = ProcessPoolExecutor(max_workers=SIMULATION_WORKERS, mp_context=multiprocessing.get_context(method))
+    atexit.register(pool.shutdown, wait=False, cancel_futures=True)
+    return pool
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def simulate_transformation(inputs, n_paths=SIMULATION_PATHS, days=SIMULATION_DAYS, workers=1, seed=None):
+    """Monte Carlo projection of XP gained, weight and body fat with percentile bands"""
+    started = time.perf_counter()
+    
+    # Always split into the same chunks and streams, so the pool only changes where they run
+    seeds = np.random.SeedSequence(seed).spawn(SIMULATION_WORKERS)
+    chunk = -(-n_paths // SIMULATION_WORKERS)
+    run = get_simulation_pool().map if workers > 1 else map
+    parts = list(run(simulate_paths, [inputs] * SIMULATION_WORKERS, [chunk] * SIMULATION_WORKERS, [days] * SIMULATION_WORKERS, seeds))
+    samples = {name: np.concatenate([part[name] for part in parts], axis=-1) for name in parts[0]}
+    
+    return {
+        'weeks': list(range(0, days // 7 + 1)),
+        'bands': {
+            name: np.percentile(samples[name], SIMULATION_PERCENTILES, axis=1)
+            for name in ('gained_xp', 'body_fat', 'weight')
+        },
+        # Nearest-rank so paths that never reach the target stay infinite rather than NaN
+        'days_to_target': np.percentile(samples['days_to_target'], SIMULATION_PERCENTILES, method='nearest'),
+        'reach_rate': float(np.isfinite(samples['days_to_target']).mean()),
+        'elapsed': time.perf_counter() - started
+    }
+
+def project_progress(projection, hunter_data):
+    """Add the hunter's current total XP and level to the cached XP-gained bands.
+    
+    Level is monotone in XP gained, so mapping the gained percentiles gives the level percentiles.
+    """
+    gained = projection['bands']['gained_xp']
+    levels = np.arange(hunter_data['level'], hunter_data['level'] + 500)
+    thresholds = np.concatenate(([0], np.cumsum(levels * 1000))) - hunter_data['xp']
+    return {
+        'total_xp': hunter_data['total_xp'] + gained,
+        'level': hunter_data['level'] + np.searchsorted(thresholds, gained, side='right') - 1
+    }
+
+def get_projection():
+    """Today's projection; the pool checkbox is read from its state ahead of the chart that draws it"""
+    return simulate_transformation(
+        build_simulation_inputs(),
+        workers=SIMULATION_WORKERS if st.session_state.get('simulation_pool') else 1,
+        seed=int(datetime.now().strftime('%Y%m%d'))
+    )
+
+def display_transformation_projection(projection):
+    st.subheader("🔮 Projected Transformation")
+    
+    col1, col2 = st.columns([3, 1])
+    with col2:
+        metric = st.selectbox(
+            "Projection",
+            ['body_fat', 'weight', 'level', 'total_xp'],
+            format_func=lambda name: {'body_fat': 'Body Fat %', 'weight': 'Weight (kg)', 'level': 'Hunter Level', 'total_xp': 'Total XP'}[name]
+        )
+        st.checkbox("Use process pool", help="Fan the simulation out across CPU cores", key="simulation_pool")
+    
+    bands = {**projection['bands'], **project_progress(projection, st.session_state.hunter_data)}
+    with col1:
+        bands = bands[metric]
+        weeks = projection['weeks']
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=weeks, y=bands[4], line=dict(width=0), showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=weeks, y=bands[0], fill='tonexty', fillcolor='rgba(255, 107, 53, 0.15)', line=dict(width=0), name='P10-P90'))
+        fig.add_trace(go.Scatter(x=weeks, y=bands[3], line=dict(width=0), showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=weeks, y=bands[1], fill='tonexty', fillcolor='rgba(255, 107, 53, 0.35)', line=dict(width=0), name='P25-P75'))
+        fig.add_trace(go.Scatter(x=weeks, y=bands[2], line=dict(color='#ffcd3c', width=3), name='Median'))
+        if metric == 'body_fat':
+            fig.add_hline(y=TARGET_BODY_FAT, line_dash='dash', line_color='#00ff88', annotation_text='Target')
+        fig.update_layout(title="Projected Trajectory", xaxis_title="Weeks from today", template='plotly_dark')
+        st.plotly_chart(fig, use_container_width=True)
+    
+    st.caption(f"{SIMULATION_PATHS:,} simulated trajectories in {projection['elapsed']:.2f}s")
+    return projection
+
+def format_projected_days(days):
+    return f"{days:.0f} days" if np.isfinite(days) else f"{SIMULATION_DAYS}+ days"
+
+# Undo/redo history of structurally shared state snapshots
+MAX_UNDO_STEPS = 50
+SNAPSHOT_CHUNK = 32  # Lists are frozen in chunks so an append only copies the last chunk
+HISTORY_EXCLUDED_KEYS = {'macro_engine'}  # Derived caches that are recomputed, not undone
+_MISSING = object()
+
+# Snapshots use built-in types (read-only mapping proxies for dicts, tuples of chunk tuples
+# for lists) because Streamlit re-executes this module, redefining any class on every rerun.
+# A tuple in a snapshot therefore always means a list, so state itself must not hold tuples;
+# it is saved as JSON anyway, which would turn them into lists on the next load.
+def freeze_state(value, previous=_MISSING):
+    """Snapshot value, reusing every unchanged node of previous so each step costs O(changes)"""
+    if isinstance(value, tuple):
+        raise TypeError("state must not contain tuples; store lists so undo restores them unchanged")
+    
+    if isinstance(value, dict):
+        shared = isinstance(previous, MappingProxyType)
+        previous_items = previous if shared else {}
+        items = {
+            key: freeze_state(item, previous_items.get(key, _MISSING))
+            for key, item in value.items() if key not in HISTORY_EXCLUDED_KEYS
+        }
+        if shared and len(items) == len(previous_items) and all(previous_items.get(key, _MISSING) is item for key, item in items.items()):
+            return previous
+        return MappingProxyType(items)
+    
+    if isinstance(value, list):
+        shared = isinstance(previous, tuple)
+        previous_chunks = previous if shared else ()
+        chunks = []
+        for number, start in enumerate(range(0, len(value), SNAPSHOT_CHUNK)):
+            previous_chunk = previous_chunks[number] if number < len(previous_chunks) else ()
+            chunk = tuple(
+                freeze_state(item, previous_chunk[offset] if offset < len(previous_chunk) else _MISSING)
+                for offset, item in enumerate(value[start:start + SNAPSHOT_CHUNK])
+            )
+            if len(chunk) == len(previous_chunk) and all(new is old for new, old in zip(chunk, previous_chunk)):
+                chunk = previous_chunk
+            chunks.append(chunk)
+        if shared and len(chunks) == len(previous_chunks) and all(new is old for new, old in zip(chunks, previous_chunks)):
+            return previous
+        return tuple(chunks)
+    
+    if previous is not _MISSING and type(previous) is type(value) and previous == value:
+        return previous
+    return value
+
+def thaw_state(frozen):
+    """Rebuild mutable dicts and lists from a snapshot"""
+    if isinstance(frozen, MappingProxyType):
+        return {key: thaw_state(item) for key, item in frozen.items()}
+    if isinstance(frozen, tuple):
+        return [thaw_state(item) for chunk in frozen for item in chunk]
+    return frozen
+
+def record_history(amend=False):
+    """Push the current state as a new undo step, or fold it into the current step when amending"""
+    history = st.session_state.undo_history
+    snapshots = history['snapshots']
+    head = snapshots[history['position']] if snapshots else _MISSING
+    snapshot = freeze_state({key: st.session_state[key] for key in STATE_KEYS}, head)
+    if snapshot is head:
+        return
+    
+    if amend and snapshots:
+        snapshots[history['position']] = snapshot
+        return
+    
+    del snapshots[history['position'] + 1:]
+    snapshots.append(snapshot)
+    del snapshots[:-(MAX_UNDO_STEPS + 1)]
+    history['position'] = len(snapshots) - 1
+
+def restore_history(position):
+    """Restore a snapshot in place so the scheduler's references to the state stay valid"""
+    history = st.session_state.undo_history
+    snapshot = history['snapshots'][position]
+    
+    # Called from button callbacks, before main() takes the lock for the rerun
+    entry = get_scheduler().register(st.session_state.hunter_data['hunter_id'], st.session_state)
+    with entry['lock']:
+        for key in STATE_KEYS:
+            live = st.session_state[key]
+            preserved = {name: live[name] for name in HISTORY_EXCLUDED_KEYS if name in live}
+            live.clear()
+            live.update(thaw_state(snapshot[key]), **preserved)
+    history['position'] = position
+    
+    st.session_state.recipe_macros = {}
+    reset_state_widgets()
+    get_leaderboard().sync(st.session_state.hunter_data)
+
+def undo():
+    history = st.session_state.undo_history
+    if history['position'] > 0:
+        restore_history(history['position'] - 1)
+        return True
+    return False
+
+def redo():
+    history = st.session_state.undo_history
+    if history['position'] < len(history['snapshots']) - 1:
+        restore_history(history['position'] + 1)
+        return True
+    return False
 
 def main():
     initialize_session_state()
-    reset_daily_data()
-    display_sidebar()
+    scheduler = get_scheduler()
+    entry = scheduler.register(st.session_state.hunter_data['hunter_id'], st.session_state)
+    
+    # Hold the hunter's lock while rendering so background jobs never interleave with a rerun
+    with entry['lock']:
+        for notice in entry['notices']:
+            st.toast(notice)
+        entry['notices'].clear()
+        
+        # Roll over before anything is logged so today's food never lands in yesterday's totals
+        reset_daily_data(st.session_state)
+        
+        # Changes made since a run that finished cleanly came from background jobs, so they
+        # belong to the current undo step; otherwise the previous run was interrupted mid-action
+        record_history(amend=st.session_state.undo_history['clean_exit'])
+        st.session_state.undo_history['clean_exit'] = False
+        
+        # Commit what this interaction's callbacks queued as one batch and one undo step
+        if commit_actions():
+            record_history()
+        
+        feedback = st.session_state.action_feedback
+        for message in feedback['messages']:
+            st.toast(message)
+        if feedback['celebrate']:
+            st.balloons()
+        feedback.update({'messages': [], 'celebrate': False})
+        
+        display_sidebar()
     
-    # Header
-    st.markdown('<h1 class="level-header">⚡ HUNTER FITNESS SYSTEM ⚡</h1>', unsafe_allow_html=True)
-    st.markdown('<p style="text-align: center; color: #ffcd3c; font-size: 1.2em;">Solo Leveling: Path to Shredded Awakening</p>', unsafe_allow_html=True)
+        # Header
+        st.markdown('<h1 class="level-header">⚡ HUNTER FITNESS SYSTEM ⚡</h1>', unsafe_allow_html=True)
+        st.markdown('<p style="text-align: center; color: #ffcd3c; font-size: 1.2em;">Solo Leveling: Path to Shredded Awakening</p>', unsafe_allow_html=True)
     
-    # Hunter Status Dashboard
-    col1, col2, col3, col4 = st.columns(4)
+        # Hunter Status Dashboard
+        col1, col2, col3, col4 = st.columns(4)
     
-    with col1:
-        level = st.session_state.hunter_data['level']
-        st.metric("🔥 Hunter Level", f"Level {level}")
+        with col1:
+            level = st.session_state.hunter_data['level']
+            st.metric("🔥 Hunter Level", f"Level {level}")
         
-        current_xp = st.session_state.hunter_data['xp']
-        xp_needed = calculate_xp_for_level(level)
-        xp_progress = min(current_xp / xp_needed * 100, 100)
+            current_xp = st.session_state.hunter_data['xp']
+            xp_needed = calculate_xp_for_level(level)
+            xp_progress = min(current_xp / xp_needed * 100, 100)
         
-        st.progress(xp_progress / 100)
-        st.write(f"XP: {current_xp:,} / {xp_needed:,}")
+            st.progress(xp_progress / 100)
+            st.write(f"XP: {current_xp:,} / {xp_needed:,}")
     
-    with col2:
-        st.metric("📊 Body Fat", f"{st.session_state.hunter_data['body_fat']:.1f}%", "Target: 10-12%")
-        fat_progress = max(0, (29.2 - st.session_state.hunter_data['body_fat']) / (29.2 - 11) * 100)
-        st.progress(fat_progress / 100)
+        with col2:
+            st.metric("📊 Body Fat", f"{st.session_state.hunter_data['body_fat']:.1f}%", "Target: 10-12%")
+            fat_progress = max(0, (29.2 - st.session_state.hunter_data['body_fat']) / (29.2 - 11) * 100)
+            st.progress(fat_progress / 100)
     
-    with col3:
-        st.metric("⚖️ Current Weight", f"{st.session_state.hunter_data['current_weight']:.1f}kg", "Target: 62-65kg")
-        weight_lost = 78.7 - st.session_state.hunter_data['current_weight']
-        st.write(f"Lost: {weight_lost:.1f}kg")
+        with col3:
+            st.metric("⚖️ Current Weight", f"{st.session_state.hunter_data['current_weight']:.1f}kg", "Target: 62-65kg")
+            weight_lost = 78.7 - st.session_state.hunter_data['current_weight']
+            st.write(f"Lost: {weight_lost:.1f}kg")
     
-    with col4:
-        st.metric("📅 Days Active", st.session_state.hunter_data['days_active'])
-        st.metric("🔥 Streak", f"{st.session_state.hunter_data['streak']} days")
+        with col4:
+            st.metric("📅 Days Active", st.session_state.hunter_data['days_active'])
+            st.metric("🔥 Streak", f"{st.session_state.hunter_data['streak']} days")
     
-    # Navigation tabs
-    tab1, tab2, tab3, tab4 = st.tabs(["⚔️ Daily Quests", "🍎 Nutrition System", "📊 Hunter Stats", "🏆 Achievements"])
+        # Navigation tabs
+        tab1, tab2, tab3, tab4 = st.tabs(["⚔️ Daily Quests", "🍎 Nutrition System", "📊 Hunter Stats", "🏆 Achievements"])
     
-    with tab1:
-        display_workout_system()
+        with tab1:
+            display_workout_system()
     
-    with tab2:
-        display_nutrition_system()
-        display_meal_suggestions()
+        with tab2:
+            display_nutrition_system()
+            display_meal_suggestions()
+            display_recipe_book()
     
-    with tab3:
-        display_stats_dashboard()
+        with tab3:
+            display_stats_dashboard()
     
-    with tab4:
-        display_achievements()
+        with tab4:
+            display_achievements()
+        
+        # Record anything the render itself changed, such as an imported file
+        record_history()
+        st.session_state.undo_history['clean_exit'] = True
+    
+    # Evaluate achievements after the page has rendered
+    scheduler.submit('achievements', st.session_state.hunter_data['hunter_id'])
 
 def display_workout_system():
     st.header("⚔️ WEEKLY DUNGEON RAIDS ⚔️")
     
-    # Workout schedule
-    workout_schedule = {
-        'Monday': {'type': 'rest', 'name': '😴 REST DAY', 'xp': 0, 'exercises': []},
-        'Tuesday': {
-            'type': 'pull', 
-            'name': '🗡️ PULL QUEST (No Assisted Pull-ups)', 
-            'xp': 150,
-            'exercises': [
-                {'name': 'Lat Pulldowns', 'sets': 4, 'reps': '8-12', 'rest': '90s', 'xp': 30},
-                {'name': 'Cable Rows', 'sets': 4, 'reps': '8-12', 'rest': '90s', 'xp': 30},
-                {'name': 'Cable Bicep Curls', 'sets': 3, 'reps': '10-15', 'rest': '60s', 'xp': 25},
-                {'name': 'Reverse Grip Curls', 'sets': 3, 'reps': '12-15', 'rest': '60s', 'xp': 20}
-            ]
-        },
-        'Wednesday': {
-            'type': 'push', 
-            'name': '🛡️ PUSH QUEST', 
-            'xp': 150,
-            'exercises': [
-                {'name': 'Chest Press', 'sets': 4, 'reps': '8-12', 'rest': '90s', 'xp': 35},
-                {'name': 'Shoulder Press Machine', 'sets': 4, 'reps': '8-12', 'rest': '90s', 'xp': 30},
-                {'name': 'Tricep Pulldowns', 'sets': 3, 'reps': '10-15', 'rest': '60s', 'xp': 25},
-                {'name': 'Push-ups (Progression)', 'sets': 2, 'reps': 'Max', 'rest': '60s', 'xp': 20}
-            ]
-        },
-        'Thursday': {
-            'type': 'legs', 
-            'name': '🦵 LEG QUEST + CORE', 
-            'xp': 200,
-            'exercises': [
-                {'name': 'Leg Press', 'sets': 4, 'reps': '12-20', 'rest': '2min', 'xp': 50},
-                {'name': 'Seated Calf Raises', 'sets': 4, 'reps': '15-20', 'rest': '60s', 'xp': 25},
-                {'name': 'Plank Hold', 'sets': 3, 'reps': '30-60s', 'rest': '60s', 'xp': 30},
-                {'name': 'Kettlebell Swings', 'sets': 3, 'reps': '15-20', 'rest': '90s', 'xp': 35}
-            ]
-        },
-        'Friday': {
-            'type': 'push', 
-            'name': '🛡️ PUSH QUEST (Repeat)', 
-            'xp': 150,
-            'exercises': [
-                {'name': 'Same as Wednesday', 'sets': '-', 'reps': '-', 'rest': '-', 'xp': 110}
-            ]
-        },
-        'Saturday': {
-            'type': 'legendary', 
-            'name': '🔥 LEGENDARY PULL QUEST (Assisted Pull-ups!)', 
-            'xp': 250,
-            'exercises': [
-                {'name': '🏆 ASSISTED PULL-UPS (LEGENDARY)', 'sets': 4, 'reps': '5-8', 'rest': '2min', 'xp': 100},
-                {'name': 'Lat Pulldowns (Light)', 'sets': 3, 'reps': '8-12', 'rest': '90s', 'xp': 25},
-                {'name': 'Cable Bicep Curls', 'sets': 3, 'reps': '10-15', 'rest': '60s', 'xp': 25}
-            ]
-        },
-        'Sunday': {
-            'type': 'legs', 
-            'name': '🦵 LEG QUEST + CORE (Repeat)', 
-            'xp': 200,
-            'exercises': [
-                {'name': 'Same as Thursday', 'sets': '-', 'reps': '-', 'rest': '-', 'xp': 140}
-            ]
-        }
-    }
-    
     # Display current day's workout
     today = datetime.now().strftime('%A')
-    current_workout = workout_schedule[today]
+    current_workout = WORKOUT_SCHEDULE[today]
     
     st.subheader(f"🎯 Today's Quest: {current_workout['name']}")
     
@@ -292,14 +1259,7 @@ def display_workout_system():
         with col1:
             st.write(f"**Total XP Available:** {current_workout['xp']} XP")
         with col2:
-            if st.button(f"Complete {today}'s Quest!", type="primary"):
-                if not st.session_state.workout_data.get(quest_key, {}).get('completed', False):
-                    add_xp(current_workout['xp'])
-                    st.session_state.workout_data[quest_key] = {'completed': True, 'exercises': []}
-                    st.session_state.hunter_data['workouts_completed'] += 1
-                    st.success(f"🎉 Quest Complete! +{current_workout['xp']} XP earned!")
-                else:
-                    st.warning("Quest already completed today!")
+            st.button(f"Complete {today}'s Quest!", type="primary", on_click=request_quest, args=(quest_key, current_workout['xp']))
         
         # Exercise breakdown
         st.write("**Quest Objectives:**")
@@ -323,20 +1283,16 @@ def display_workout_system():
             
             with col5:
                 exercise_key = f"{quest_key}_{i}"
-                if st.button("✅", key=f"complete_{exercise_key}"):
-                    if exercise_key not in st.session_state.workout_data.get(quest_key, {}).get('exercises', []):
-                        add_xp(exercise['xp'])
-                        if quest_key not in st.session_state.workout_data:
-                            st.session_state.workout_data[quest_key] = {'completed': False, 'exercises': []}
-                        st.session_state.workout_data[quest_key]['exercises'].append(exercise_key)
-                        st.session_state.hunter_data['exercises_completed'] += 1
-                        st.success(f"+{exercise['xp']} XP!")
+                st.button(
+                    "✅", key=f"complete_{exercise_key}", on_click=request_exercise,
+                    args=(quest_key, exercise_key, exercise['xp'], f"+{exercise['xp']} XP!")
+                )
+            
+            display_rest_timer(quest_key, exercise_key, exercise)
     else:
         st.info("🛌 Rest day! Your body grows stronger during recovery. Take this time to plan your nutrition and prepare for tomorrow's quest!")
         
-        if st.button("Log Rest Day"):
-            add_xp(50)  # Small XP for consistency
-            st.success("🎉 Rest day logged! +50 XP for consistency!")
+        st.button("Log Rest Day", on_click=request_rest_day)
     
     # Weekly overview
     st.subheader("📅 Weekly Quest Overview")
@@ -345,7 +1301,7 @@ def display_workout_system():
     progress_data = []
     
     for day in days:
-        workout = workout_schedule[day]
+        workout = WORKOUT_SCHEDULE[day]
         quest_key = f"{day.lower()}_{workout['type']}"
         completed = st.session_state.workout_data.get(quest_key, {}).get('completed', False)
         progress_data.append({
@@ -362,13 +1318,24 @@ def display_workout_system():
 def display_nutrition_system():
     st.header("🍎 HUNTER NUTRITION SYSTEM 🍎")
     
-    # Nutrition targets
-    targets = {
-        'calories': 1790,
-        'protein': 157,
-        'carbs': 179,
-        'fats': 50
-    }
+    # Adaptive targets, refreshed once per day from intake and weight trend
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        st.selectbox(
+            "🎯 Goal",
+            list(MACRO_GOALS),
+            index=list(MACRO_GOALS).index(st.session_state.hunter_data.get('goal', 'cut')),
+            format_func=lambda key: MACRO_GOALS[key]['label'],
+            key="macro_goal",
+            on_change=request_goal
+        )
+    targets = get_macro_targets()
+    with col2:
+        engine = st.session_state.nutrition_data['macro_engine']
+        if engine['source'] == 'trend':
+            st.caption(f"Estimated TDEE: {engine['tdee']:.0f} kcal from your intake and weight trend (updated {engine['date']})")
+        else:
+            st.caption(f"Estimated TDEE: {engine['tdee']:.0f} kcal from body weight. Log food and weigh in for {TDEE_MIN_INTAKE_DAYS}+ days to personalise it.")
     
     # Current nutrition status
     col1, col2, col3, col4 = st.columns(4)
@@ -396,58 +1363,44 @@ def display_nutrition_system():
     # Food logging
     st.subheader("📝 Log Food Intake")
     
+    display_quick_add()
+    
     col1, col2 = st.columns([2, 1])
     
     with col1:
+        # Type-to-search over the hunter's foods, most frequent and recent first
+        food_index = st.session_state.nutrition_data.get('food_index', {})
+        if food_index:
+            st.selectbox(
+                "🔎 Find a food you've logged before",
+                [item['name'].strip().lower() for item in ranked_foods(food_index)],
+                index=None,
+                format_func=lambda key: food_index[key]['name'] if key in food_index else key,
+                placeholder="Start typing to autofill the form...",
+                key="food_autocomplete",
+                on_change=fill_food_form
+            )
+        
         with st.form("food_form"):
-            food_name = st.text_input("Food Item", placeholder="e.g., Chicken Breast, Rice")
+            food_name = st.text_input("Food Item", placeholder="e.g., Chicken Breast, Rice", key="food_name")
             
             col_cal, col_pro, col_car, col_fat = st.columns(4)
             with col_cal:
-                calories = st.number_input("Calories", min_value=0, step=1)
+                calories = st.number_input("Calories", min_value=0, step=1, key="food_calories")
             with col_pro:
-                protein = st.number_input("Protein (g)", min_value=0.0, step=0.1)
+                protein = st.number_input("Protein (g)", min_value=0.0, step=0.1, key="food_protein")
             with col_car:
-                carbs = st.number_input("Carbs (g)", min_value=0.0, step=0.1)
+                carbs = st.number_input("Carbs (g)", min_value=0.0, step=0.1, key="food_carbs")
             with col_fat:
-                fats = st.number_input("Fats (g)", min_value=0.0, step=0.1)
+                fats = st.number_input("Fats (g)", min_value=0.0, step=0.1, key="food_fats")
             
-            submitted = st.form_submit_button("Add Food (+10 XP)", type="primary")
-            
-            if submitted and food_name:
-                # Add to nutrition totals
-                st.session_state.nutrition_data['daily_calories'] += calories
-                st.session_state.nutrition_data['daily_protein'] += protein
-                st.session_state.nutrition_data['daily_carbs'] += carbs
-                st.session_state.nutrition_data['daily_fats'] += fats
-                
-                # Add to food log
-                food_entry = {
-                    'name': food_name,
-                    'calories': calories,
-                    'protein': protein,
-                    'carbs': carbs,
-                    'fats': fats,
-                    'time': datetime.now().strftime('%H:%M')
-                }
-                st.session_state.nutrition_data['food_log'].append(food_entry)
-                
-                # Add XP
-                add_xp(10)
-                st.success(f"✅ {food_name} logged! +10 XP")
-                st.rerun()
+            st.form_submit_button("Add Food (+10 XP)", type="primary", on_click=submit_food_form)
     
     with col2:
-        if st.button("🗑️ Clear Today's Log", type="secondary"):
-            st.session_state.nutrition_data.update({
-                'daily_calories': 0,
-                'daily_protein': 0,
-                'daily_carbs': 0,
-                'daily_fats': 0,
-                'food_log': []
-            })
-            st.success("Food log cleared!")
-            st.rerun()
+        st.button(
+            "🗑️ Clear Today's Log", type="secondary", on_click=dispatch,
+            args=('clear_food_log',), kwargs={'mutate': clear_food_log, 'message': "Food log cleared!"}
+        )
     
     # Food log display
     if st.session_state.nutrition_data['food_log']:
@@ -515,13 +1468,26 @@ def display_stats_dashboard():
         estimated_fat_loss = (st.session_state.hunter_data['total_xp'] / 1000) * 0.1  # Rough estimation
         st.metric("🔥 Est. Fat Loss", f"{estimated_fat_loss:.1f}kg")
     
+    # Rolling averages refreshed by the background analytics job
+    analytics = get_scheduler().hunters.get(st.session_state.hunter_data['hunter_id'], {}).get('analytics')
+    if analytics and analytics['days_logged']:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("🍽️ Avg Calories (7d)", f"{analytics['avg_calories']:.0f}")
+        with col2:
+            st.metric("🥩 Avg Protein (7d)", f"{analytics['avg_protein']:.1f}g")
+        with col3:
+            st.metric("📅 Days Logged (7d)", analytics['days_logged'])
+        st.caption(f"Analytics refreshed at {analytics['updated']}")
+    
     # Progress tracking
     st.subheader("📈 Transformation Timeline")
     
     # Calculate days since start
     start_date = datetime.strptime(st.session_state.hunter_data['start_date'], '%Y-%m-%d')
     days_elapsed = (datetime.now() - start_date).days
-    days_remaining = max(0, 180 - days_elapsed)  # 6 months = ~180 days
+    projection = get_projection()
+    p10, _, median, _, p90 = projection['days_to_target']
     
     col1, col2 = st.columns(2)
     
@@ -530,9 +1496,10 @@ def display_stats_dashboard():
         **🎯 Transformation Timeline**
         - **Current Status:** Hunter Level {st.session_state.hunter_data['level']} - {"Beginning Awakening" if st.session_state.hunter_data['level'] < 5 else "Rapid Progress" if st.session_state.hunter_data['level'] < 15 else "Elite Hunter"}
         - **Days Elapsed:** {days_elapsed} days
-        - **Days Remaining:** {days_remaining} days
+        - **Days Remaining (median):** {format_projected_days(median)}
         - **Target Body Fat:** 10-12%
-        - **Estimated Completion:** 6-8 months
+        - **Estimated Completion:** {format_projected_days(p10)} - {format_projected_days(p90)} (P10-P90)
+        - **Chance Within {SIMULATION_DAYS} Days:** {projection['reach_rate']:.0%}
         """)
     
     with col2:
@@ -556,6 +1523,8 @@ def display_stats_dashboard():
         fig.update_layout(template='plotly_dark')
         st.plotly_chart(fig, use_container_width=True)
     
+    display_transformation_projection(projection)
+    
     # Weight and body fat tracking
     st.subheader("⚖️ Body Composition Tracking")
     
@@ -563,85 +1532,49 @@ def display_stats_dashboard():
     
     with col1:
         # Weight update
-        new_weight = st.number_input(
+        st.number_input(
             "Update Current Weight (kg)",
             min_value=50.0,
             max_value=120.0,
             value=st.session_state.hunter_data['current_weight'],
-            step=0.1
+            step=0.1,
+            key="new_weight"
         )
         
-        if st.button("Update Weight"):
-            st.session_state.hunter_data['current_weight'] = new_weight
-            st.success("Weight updated!")
+        st.button("Update Weight", on_click=request_body_stat, args=('current_weight', 'new_weight', "Weight updated!"))
     
     with col2:
         # Body fat update
-        new_body_fat = st.number_input(
+        st.number_input(
             "Update Body Fat %",
             min_value=5.0,
             max_value=40.0,
             value=st.session_state.hunter_data['body_fat'],
-            step=0.1
+            step=0.1,
+            key="new_body_fat"
         )
         
-        if st.button("Update Body Fat"):
-            st.session_state.hunter_data['body_fat'] = new_body_fat
-            st.success("Body fat updated!")
+        st.button("Update Body Fat", on_click=request_body_stat, args=('body_fat', 'new_body_fat', "Body fat updated!"))
+
+def record_weigh_in():
+    """Record today's weight and body fat, replacing any earlier reading from today"""
+    hunter_data = st.session_state.hunter_data
+    today = datetime.now().strftime('%Y-%m-%d')
+    weight_log = hunter_data.setdefault('weight_log', [])
+    if weight_log and weight_log[-1]['date'] == today:
+        weight_log.pop()
+    weight_log.append({'date': today, 'weight': hunter_data['current_weight'], 'body_fat': hunter_data['body_fat']})
 
 def display_achievements():
     st.header("🏆 HUNTER ACHIEVEMENTS 🏆")
     
-    achievements = {
-        'first_workout': {
-            'name': '🎯 First Quest Complete',
-            'description': 'Complete your first workout',
-            'condition': st.session_state.hunter_data['workouts_completed'] >= 1,
-            'xp_reward': 100
-        },
-        'week_streak': {
-            'name': '🔥 Week Warrior',
-            'description': 'Maintain a 7-day streak',
-            'condition': st.session_state.hunter_data['streak'] >= 7,
-            'xp_reward': 500
-        },
-        'month_streak': {
-            'name': '⚡ Monthly Master',
-            'description': 'Maintain a 30-day streak',
-            'condition': st.session_state.hunter_data['streak'] >= 30,
-            'xp_reward': 2000
-        },
-        'first_pullup': {
-            'name': '💪 Pull-up Pioneer',
-            'description': 'Complete 10 assisted pull-up sessions',
-            'condition': st.session_state.hunter_data['exercises_completed'] >= 40,  # Rough estimate
-            'xp_reward': 750
-        },
-        'level_10': {
-            'name': '🌟 Elite Hunter',
-            'description': 'Reach Hunter Level 10',
-            'condition': st.session_state.hunter_data['level'] >= 10,
-            'xp_reward': 1000
-        },
-        'shredded_goal': {
-            'name': '🏆 Shredded Awakening',
-            'description': 'Reach 12% body fat or lower',
-            'condition': st.session_state.hunter_data['body_fat'] <= 12.0,
-            'xp_reward': 5000
-        }
-    }
-    
-    for achievement_key, achievement in achievements.items():
+    # Unlocks are granted by the background achievements job
+    for achievement_key, achievement in ACHIEVEMENTS.items():
+        unlocked = st.session_state.achievements.get(achievement_key, False)
         col1, col2, col3 = st.columns([3, 1, 1])
         
         with col1:
-            if achievement['condition']:
-                if not st.session_state.achievements[achievement_key]:
-                    # Achievement just unlocked!
-                    st.session_state.achievements[achievement_key] = True
-                    add_xp(achievement['xp_reward'])
-                    st.success(f"🎉 Achievement Unlocked: {achievement['name']}! +{achievement['xp_reward']} XP!")
-                
+            if unlocked:
                 st.success(f"✅ **{achievement['name']}** - {achievement['description']}")
             else:
                 st.info(f"🔒 **{achievement['name']}** - {achievement['description']}")
@@ -650,14 +1583,14 @@ def display_achievements():
             st.write(f"**{achievement['xp_reward']} XP**")
         
         with col3:
-            if achievement['condition']:
+            if unlocked:
                 st.write("**UNLOCKED**")
             else:
                 st.write("*Locked*")
     
     # Achievement progress summary
-    unlocked = sum(1 for key in achievements if st.session_state.achievements[key])
-    total = len(achievements)
+    unlocked = sum(1 for key in ACHIEVEMENTS if st.session_state.achievements.get(key))
+    total = len(ACHIEVEMENTS)
     
     st.subheader(f"🏅 Achievement Progress: {unlocked}/{total}")
     st.progress(unlocked / total)
@@ -666,14 +1599,9 @@ def display_achievements():
         st.balloons()
         st.success("🏆 LEGENDARY HUNTER STATUS ACHIEVED! You have unlocked all achievements!")
 
-def save_data():
-    """Save session state to JSON file"""
-    data_to_save = {
-        'hunter_data': st.session_state.hunter_data,
-        'nutrition_data': st.session_state.nutrition_data,
-        'workout_data': st.session_state.workout_data,
-        'achievements': st.session_state.achievements
-    }
+def serialize_state(state):
+    """Serialize hunter state to JSON without mutating the live dicts"""
+    data_to_save = {key: dict(state[key]) for key in STATE_KEYS}
     
     # Convert datetime objects to strings
     data_to_save['nutrition_data']['last_reset'] = str(data_to_save['nutrition_data']['last_reset'])
@@ -681,6 +1609,10 @@ def save_data():
     
     return json.dumps(data_to_save, indent=2)
 
+def save_data():
+    """Save session state to JSON file"""
+    return serialize_state(st.session_state)
+
 def load_data(json_data):
     """Load data from JSON"""
     try:
@@ -689,12 +1621,23 @@ def load_data(json_data):
         # Convert string dates back to date objects
         data['nutrition_data']['last_reset'] = datetime.strptime(data['nutrition_data']['last_reset'], '%Y-%m-%d').date()
         data['workout_data']['last_reset'] = datetime.strptime(data['workout_data']['last_reset'], '%Y-%m-%d').date()
+        data['nutrition_data'].setdefault('history', [])
+        data['nutrition_data'].setdefault('food_index', {})
+        data['hunter_data'].setdefault('weight_log', [])
+        data['hunter_data'].setdefault('hunter_id', uuid.uuid4().hex[:12])
+        data['hunter_data'].setdefault('hunter_name', f"Hunter {data['hunter_data']['hunter_id'][:4].upper()}")
+        data['hunter_data'].setdefault('weekly_xp', 0)
+        data['hunter_data'].setdefault('week_start', str(current_week_start()))
         
         # Update session state
         st.session_state.hunter_data = data['hunter_data']
         st.session_state.nutrition_data = data['nutrition_data']
         st.session_state.workout_data = data['workout_data']
         st.session_state.achievements = data['achievements']
+        st.session_state.recipe_book = data.get('recipe_book', {'ingredients': {}, 'recipes': {}})
+        st.session_state.recipe_macros = {}
+        reset_state_widgets()
+        get_leaderboard().sync(data['hunter_data'])
         
         return True
     except Exception as e:
@@ -710,6 +1653,27 @@ def display_sidebar():
     st.sidebar.metric("Total XP", f"{st.session_state.hunter_data['total_xp']:,}")
     st.sidebar.metric("Workouts Done", st.session_state.hunter_data['workouts_completed'])
     
+    # Leaderboard standing
+    leaderboard = get_leaderboard()
+    hunter_id = st.session_state.hunter_data['hunter_id']
+    rank = leaderboard.rank('total_xp', hunter_id)
+    if rank is not None:
+        st.sidebar.metric("🏅 XP Rank", f"#{rank:,} of {len(leaderboard):,}")
+    else:
+        st.sidebar.caption("🏅 Earn XP to join the leaderboard!")
+    
+    with st.sidebar.expander("🏅 Hunter Leaderboard"):
+        metric = st.selectbox("Rank by", list(LEADERBOARD_METRICS), format_func=LEADERBOARD_METRICS.get, key="leaderboard_metric")
+        st.text_input(
+            "Hunter Name", value=st.session_state.hunter_data['hunter_name'], max_chars=24,
+            key="hunter_name_input", on_change=request_hunter_name
+        )
+        
+        st.write("**Top Hunters**")
+        st.dataframe(pd.DataFrame(leaderboard.top(metric, 10), columns=['rank', 'name', 'value']), use_container_width=True, hide_index=True)
+        st.write("**Around You**")
+        st.dataframe(pd.DataFrame(leaderboard.around(metric, hunter_id), columns=['rank', 'name', 'value']), use_container_width=True, hide_index=True)
+    
     st.sidebar.divider()
     
     # Data management
@@ -740,23 +1704,21 @@ def display_sidebar():
     # Quick actions
     st.sidebar.subheader("⚡ Quick Actions")
     
-    if st.sidebar.button("🎯 Mark Day as Active"):
-        if st.session_state.hunter_data['last_active'] != datetime.now().strftime('%Y-%m-%d'):
-            st.session_state.hunter_data['days_active'] += 1
-            st.session_state.hunter_data['streak'] += 1
-            st.session_state.hunter_data['last_active'] = datetime.now().strftime('%Y-%m-%d')
-            add_xp(25)
-            st.sidebar.success("✅ Day marked as active! +25 XP")
-        else:
-            st.sidebar.warning("Already marked active today!")
+    history = st.session_state.undo_history
+    col1, col2 = st.sidebar.columns(2)
+    with col1:
+        st.button("↩️ Undo", disabled=history['position'] == 0, use_container_width=True, on_click=undo)
+    with col2:
+        st.button("↪️ Redo", disabled=history['position'] >= len(history['snapshots']) - 1, use_container_width=True, on_click=redo)
+    st.sidebar.caption(f"History: step {history['position']} of {max(len(history['snapshots']) - 1, 0)}")
+    
+    st.sidebar.button("🎯 Mark Day as Active", on_click=request_day_active)
     
     with st.sidebar.expander("🔄 Reset Weekly Progress"):
-        if st.button("Confirm Reset", type="primary"):
-            for day in st.session_state.workout_data:
-                if day != 'last_reset':
-                    st.session_state.workout_data[day] = {'completed': False, 'exercises': []}
-            st.success("Weekly progress reset!")
-            st.rerun()
+        st.button(
+            "Confirm Reset", type="primary", on_click=dispatch,
+            args=('reset_weekly_progress',), kwargs={'mutate': reset_weekly_progress, 'message': "Weekly progress reset!"}
+        )
     
     st.sidebar.divider()
     
@@ -774,13 +1736,27 @@ def display_sidebar():
     
     daily_tip = random.choice(tips)
     st.sidebar.info(daily_tip)
+    
+    # Background job health
+    with st.sidebar.expander("⚙️ System Jobs"):
+        scheduler = get_scheduler()
+        with scheduler.lock:
+            job_rows = [
+                {'Job': name, 'Runs': m['runs'], 'Errors': m['errors'], 'Last (ms)': round(m['last_ms'], 2),
+                 'Avg (ms)': round(m['avg_ms'], 2), 'Max (ms)': round(m['max_ms'], 2), 'Last Run': m['last_run'] or '-'}
+                for name, m in scheduler.metrics.items()
+            ]
+            active_hunters = len(scheduler.hunters)
+        st.write(f"Active hunters: {active_hunters}")
+        st.dataframe(pd.DataFrame(job_rows), use_container_width=True, hide_index=True)
 
 # Enhanced nutrition suggestions
 def display_meal_suggestions():
     st.subheader("🍽️ Hunter Meal Suggestions")
     
     # Calculate remaining macros
-    remaining_cals = max(0, 1790 - st.session_state.nutrition_data['daily_calories'])
+    targets = get_macro_targets()
+    remaining_cals = max(0, targets['calories'] - st.session_state.nutrition_data['daily_calories'])
     
     if remaining_cals > 100:  # Only show if significant calories remain
         col1, col2, col3 = st.columns(3)
@@ -796,9 +1772,7 @@ def display_meal_suggestions():
             ]
             
             for food in protein_foods:
-                if st.button(f"Add {food['name']}", key=f"protein_{food['name']}"):
-                    log_food(food)
-                    st.rerun()
+                st.button(f"Add {food['name']}", key=f"protein_{food['name']}", on_click=log_food, args=(food,))
         
         with col2:
             st.write("**🍞 Quality Carbs**")
@@ -811,9 +1785,7 @@ def display_meal_suggestions():
             ]
             
             for food in carb_foods:
-                if st.button(f"Add {food['name']}", key=f"carbs_{food['name']}"):
-                    log_food(food)
-                    st.rerun()
+                st.button(f"Add {food['name']}", key=f"carbs_{food['name']}", on_click=log_food, args=(food,))
         
         with col3:
             st.write("**🥑 Healthy Fats**")
@@ -826,13 +1798,11 @@ def display_meal_suggestions():
             ]
             
             for food in fat_foods:
-                if st.button(f"Add {food['name']}", key=f"fats_{food['name']}"):
-                    log_food(food)
-                    st.rerun()
+                st.button(f"Add {food['name']}", key=f"fats_{food['name']}", on_click=log_food, args=(food,))
     
-    remaining_protein = max(0, 157 - st.session_state.nutrition_data['daily_protein'])
-    remaining_carbs = max(0, 179 - st.session_state.nutrition_data['daily_carbs'])
-    remaining_fats = max(0, 50 - st.session_state.nutrition_data['daily_fats'])
+    remaining_protein = max(0, targets['protein'] - st.session_state.nutrition_data['daily_protein'])
+    remaining_carbs = max(0, targets['carbs'] - st.session_state.nutrition_data['daily_carbs'])
+    remaining_fats = max(0, targets['fats'] - st.session_state.nutrition_data['daily_fats'])
     
     st.info(f"""
     **🎯 Remaining Daily Targets:**
@@ -842,8 +1812,21 @@ def display_meal_suggestions():
     - Fats: {remaining_fats:.1f}g
     """)
 
-# Utility function for logging food from suggestions
+# Utility functions for logging food from the form, suggestions and recipes
 def log_food(food):
+    dispatch('log_food', mutate=apply_food, args=(food,), xp=10, message=f"✅ {food['name']} logged! +10 XP")
+
+def submit_food_form():
+    if st.session_state.food_name:
+        log_food({
+            'name': st.session_state.food_name,
+            'cal': st.session_state.food_calories,
+            'pro': st.session_state.food_protein,
+            'car': st.session_state.food_carbs,
+            'fat': st.session_state.food_fats
+        })
+
+def apply_food(food):
     st.session_state.nutrition_data['daily_calories'] += food['cal']
     st.session_state.nutrition_data['daily_protein'] += food['pro']
     st.session_state.nutrition_data['daily_carbs'] += food['car']
@@ -858,7 +1841,276 @@ def log_food(food):
         'time': datetime.now().strftime('%H:%M')
     }
     st.session_state.nutrition_data['food_log'].append(food_entry)
-    add_xp(10)
+    index_food(st.session_state.nutrition_data.setdefault('food_index', {}), food)
+
+def clear_food_log():
+    st.session_state.nutrition_data.update({
+        'daily_calories': 0,
+        'daily_protein': 0,
+        'daily_carbs': 0,
+        'daily_fats': 0,
+        'food_log': []
+    })
+
+# Frequency and recency index over logged foods
+FOOD_INDEX_LIMIT = 100
+FOOD_HALF_LIFE_DAYS = 7
+
+def _days_now():
+    return time.time() / 86400
+
+def food_score(item, now=None):
+    """Frecency: each log adds 1, decaying by half every FOOD_HALF_LIFE_DAYS"""
+    now = _days_now() if now is None else now
+    return item['score'] * 0.5 ** ((now - item['last_used']) / FOOD_HALF_LIFE_DAYS)
+
+def index_food(food_index, food):
+    """Record one log of a food in O(1), keyed by its normalised name"""
+    now = _days_now()
+    key = food['name'].strip().lower()
+    item = food_index.get(key)
+    if item is None:
+        # Keep the index bounded by evicting the least used food
+        if len(food_index) >= FOOD_INDEX_LIMIT:
+            del food_index[min(food_index, key=lambda name: food_score(food_index[name], now))]
+        item = food_index[key] = {'count': 0, 'score': 0.0, 'last_used': now}
+    
+    item.update({
+        'name': food['name'],
+        'cal': food['cal'],
+        'pro': food['pro'],
+        'car': food['car'],
+        'fat': food['fat'],
+        'count': item['count'] + 1,
+        'score': food_score(item, now) + 1,
+        'last_used': now
+    })
+
+def ranked_foods(food_index, limit=None):
+    now = _days_now()
+    ranked = sorted(food_index.values(), key=lambda item: food_score(item, now), reverse=True)
+    return ranked[:limit] if limit else ranked
+
+def fill_food_form():
+    """Prefill the food form from the autocomplete selection"""
+    key = st.session_state.food_autocomplete
+    item = st.session_state.nutrition_data.get('food_index', {}).get(key)
+    if item:
+        st.session_state.food_name = item['name']
+        st.session_state.food_calories = int(round(item['cal']))
+        st.session_state.food_protein = float(item['pro'])
+        st.session_state.food_carbs = float(item['car'])
+        st.session_state.food_fats = float(item['fat'])
+
+def display_quick_add():
+    food_index = st.session_state.nutrition_data.get('food_index', {})
+    if not food_index:
+        return
+    
+    st.write("**⚡ Recent & Frequent**")
+    favourites = ranked_foods(food_index, 6)
+    cols = st.columns(len(favourites))
+    for col, food in zip(cols, favourites):
+        with col:
+            st.button(
+                f"➕ {food['name']}", key=f"quick_add_{food['name']}", help=f"{food['cal']:.0f} kcal | logged {food['count']}x",
+                on_click=log_food, args=({field: food[field] for field in ('name', 'cal', 'pro', 'car', 'fat')},)
+            )
+
+# Recipe composition
+MACRO_FIELDS = ('cal', 'pro', 'car', 'fat')
+
+def compute_recipe_macros(name, recipe_book=None, memo=None):
+    """Per-serving macros for a recipe, memoised until one of its ingredients changes"""
+    recipe_book = recipe_book if recipe_book is not None else st.session_state.recipe_book
+    memo = memo if memo is not None else st.session_state.recipe_macros
+    if name in memo:
+        return memo[name]
+    
+    recipe = recipe_book['recipes'][name]
+    totals = dict.fromkeys(MACRO_FIELDS, 0.0)
+    for component in recipe['components']:
+        if component['kind'] == 'recipe':
+            macros = compute_recipe_macros(component['name'], recipe_book, memo)
+        else:
+            macros = recipe_book['ingredients'][component['name']]
+        for field in MACRO_FIELDS:
+            totals[field] += macros[field] * component['quantity']
+    
+    servings = max(recipe['servings'], 1)
+    memo[name] = {'name': name, **{field: round(totals[field] / servings, 1) for field in MACRO_FIELDS}}
+    return memo[name]
+
+def recipe_uses(recipe_book, name, kind, target):
+    """True if recipe `name` contains `target` (of the given kind) anywhere in its ingredient graph"""
+    for component in recipe_book['recipes'][name]['components']:
+        if component['kind'] == kind and component['name'] == target:
+            return True
+        if component['kind'] == 'recipe' and recipe_uses(recipe_book, component['name'], kind, target):
+            return True
+    return False
+
+def invalidate_recipe_macros(kind, name, recipe_book=None, memo=None):
+    """Drop memoised macros for every recipe that depends on the changed ingredient or recipe"""
+    recipe_book = recipe_book if recipe_book is not None else st.session_state.recipe_book
+    memo = memo if memo is not None else st.session_state.recipe_macros
+    if kind == 'recipe':
+        memo.pop(name, None)
+    for recipe_name in list(memo):
+        if recipe_name in recipe_book['recipes'] and recipe_uses(recipe_book, recipe_name, kind, name):
+            memo.pop(recipe_name, None)
+
+def save_ingredient(name, cal, pro, car, fat):
+    st.session_state.recipe_book['ingredients'][name] = {'name': name, 'cal': cal, 'pro': pro, 'car': car, 'fat': fat}
+    invalidate_recipe_macros('ingredient', name)
+
+def recipe_creates_cycle(name, components):
+    """True if any sub-recipe would make the recipe contain itself"""
+    recipe_book = st.session_state.recipe_book
+    return any(
+        component['kind'] == 'recipe' and (
+            component['name'] == name or recipe_uses(recipe_book, component['name'], 'recipe', name)
+        )
+        for component in components
+    )
+
+def save_recipe(name, servings, components):
+    recipe_book = st.session_state.recipe_book
+    
+    # Invalidate before overwriting so dependents are found through the old graph too
+    if name in recipe_book['recipes']:
+        invalidate_recipe_macros('recipe', name)
+    recipe_book['recipes'][name] = {'servings': servings, 'components': components}
+    invalidate_recipe_macros('recipe', name)
+
+def submit_ingredient_form():
+    name = st.session_state.ingredient_name
+    if name:
+        dispatch(
+            'save_ingredient', mutate=save_ingredient,
+            args=(name, st.session_state.ingredient_cal, st.session_state.ingredient_pro, st.session_state.ingredient_car, st.session_state.ingredient_fat),
+            message=f"✅ {name} saved!"
+        )
+
+def submit_recipe_form():
+    name = st.session_state.recipe_name
+    if not name:
+        return
+    
+    # The editor starts empty, so its edit state holds every component as an added row
+    rows = [row for row in st.session_state.recipe_components['added_rows'] if row.get('Component')]
+    parsed = [
+        {
+            'kind': 'recipe' if row['Component'].startswith('📖') else 'ingredient',
+            'name': row['Component'].split(' ', 1)[1],
+            'quantity': float(row['Quantity'] if row.get('Quantity') is not None else 1.0)
+        }
+        for row in rows
+    ]
+    if not parsed:
+        notify("⚠️ Add at least one component!")
+    elif recipe_creates_cycle(name, parsed):
+        notify("❌ A recipe can't include itself!")
+    else:
+        dispatch(
+            'save_recipe', mutate=save_recipe, args=(name, int(st.session_state.recipe_servings), parsed),
+            message=f"✅ {name} saved!"
+        )
+
+def display_recipe_book():
+    st.subheader("📖 Hunter Recipe Book")
+    
+    recipe_book = st.session_state.recipe_book
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        with st.expander("🥕 Add / Update Ingredient"):
+            with st.form("ingredient_form"):
+                st.text_input("Ingredient", placeholder="e.g., Chicken Breast (100g)", key="ingredient_name")
+                col_cal, col_pro, col_car, col_fat = st.columns(4)
+                with col_cal:
+                    st.number_input("Calories", min_value=0, step=1, key="ingredient_cal")
+                with col_pro:
+                    st.number_input("Protein (g)", min_value=0.0, step=0.1, key="ingredient_pro")
+                with col_car:
+                    st.number_input("Carbs (g)", min_value=0.0, step=0.1, key="ingredient_car")
+                with col_fat:
+                    st.number_input("Fats (g)", min_value=0.0, step=0.1, key="ingredient_fat")
+                
+                st.form_submit_button("Save Ingredient", on_click=submit_ingredient_form)
+    
+    with col2:
+        with st.expander("🍲 Create / Update Recipe"):
+            options = [f"🥕 {name}" for name in recipe_book['ingredients']] + [f"📖 {name}" for name in recipe_book['recipes']]
+            if not options:
+                st.info("Add an ingredient first!")
+            else:
+                with st.form("recipe_form"):
+                    st.text_input("Recipe / Meal Name", placeholder="e.g., Chicken Rice Bowl", key="recipe_name")
+                    st.number_input("Servings", min_value=1, step=1, key="recipe_servings")
+                    st.data_editor(
+                        pd.DataFrame({'Component': pd.Series(dtype='str'), 'Quantity': pd.Series(dtype='float')}),
+                        column_config={
+                            'Component': st.column_config.SelectboxColumn("Ingredient / Sub-recipe", options=options, required=True),
+                            'Quantity': st.column_config.NumberColumn("Quantity", min_value=0.0, step=0.1, default=1.0)
+                        },
+                        num_rows="dynamic",
+                        use_container_width=True,
+                        hide_index=True,
+                        key="recipe_components"
+                    )
+                    
+                    st.form_submit_button("Save Recipe", on_click=submit_recipe_form)
+    
+    # Saved recipes with one-click logging
+    for name in recipe_book['recipes']:
+        macros = compute_recipe_macros(name)
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.write(f"**{name}** - {macros['cal']:.0f} kcal | {macros['pro']:.1f}g P | {macros['car']:.1f}g C | {macros['fat']:.1f}g F per serving")
+        with col2:
+            st.button("Log Serving (+10 XP)", key=f"recipe_{name}", on_click=log_food, args=(macros,))
+
+# Client-side rest timer: counts sets and rest in the browser and reports back once per exercise
+_rest_timer = components.declare_component(
+    "rest_timer",
+    path=str(Path(__file__).parent / "components" / "rest_timer")
+)
+
+def parse_rest_seconds(rest):
+    """Convert schedule rest values like '60s', '90s' or '2min' to seconds"""
+    match = re.fullmatch(r"\s*(\d+)\s*(s|sec|min)\s*", str(rest))
+    if not match:
+        return None
+    return int(match.group(1)) * (60 if match.group(2) == 'min' else 1)
+
+def display_rest_timer(quest_key, exercise_key, exercise):
+    rest_seconds = parse_rest_seconds(exercise['rest'])
+    if rest_seconds is None or not isinstance(exercise['sets'], int):
+        return
+    
+    completed = exercise_key in st.session_state.workout_data.get(quest_key, {}).get('exercises', [])
+    _rest_timer(
+        timer_id=f"{datetime.now().date()}:{exercise_key}",
+        exercise_key=exercise_key,
+        sets=exercise['sets'],
+        rest_seconds=rest_seconds,
+        completed=completed,
+        key=f"rest_timer_{exercise_key}",
+        default=None,
+        on_change=lambda: report_rest_timer(quest_key, exercise_key, exercise)
+    )
+
+def report_rest_timer(quest_key, exercise_key, exercise):
+    # The component keeps returning its last value on later reruns, so only act on new reports
+    result = st.session_state[f"rest_timer_{exercise_key}"]
+    seen = st.session_state.setdefault('rest_timer_reports', set())
+    if result and result['finished_at'] not in seen:
+        seen.add(result['finished_at'])
+        request_exercise(
+            quest_key, exercise_key, exercise['xp'],
+            f"⏱️ {exercise['name']} finished ({result['sets_completed']} sets)! +{exercise['xp']} XP!"
+        )
 
 # Main execution block
 if __name__ == "__main__":
@@ -0,0 +1,67 @@
+"""Monte Carlo core of the transformation projection.
+
+Kept out of leveling.py so process-pool workers can import it without
+re-running the Streamlit app.
+"""
+import numpy as np
+
+TARGET_BODY_FAT = 11.0
+KCAL_PER_KG = 7700
+WORKOUT_BURN = 300  # Extra kcal burned on a completed training day
+FAT_FRACTION = 0.75  # Share of weight change that comes from fat mass
+
+def simulate_paths(inputs, n_paths, days, seed):
+    """Simulate n_paths weekly trajectories; returns per-week samples for each metric"""
+    rng = np.random.default_rng(seed)
+    weeks = days // 7
+    daily_xp = np.asarray(inputs['daily_xp'], dtype=np.float32)
+    training_days = np.asarray(inputs['training_days'])
+    training_share = training_days.mean()
+    
+    adherence = rng.beta(inputs['adherence_a'], inputs['adherence_b'], n_paths).astype(np.float32)
+    intake_bias = rng.normal(0, 150, n_paths).astype(np.float32)
+    
+    # Resting maintenance per kg, so the average day including training burns the TDEE estimate
+    expected_burn = training_share * inputs['adherence_a'] / (inputs['adherence_a'] + inputs['adherence_b']) * WORKOUT_BURN
+    tdee_per_kg = (inputs['tdee'] - expected_burn) / inputs['weight']
+    
+    weight = np.full(n_paths, inputs['weight'], dtype=np.float32)
+    fat_mass = weight * np.float32(inputs['body_fat'] / 100)
+    gained_xp = np.zeros(n_paths, dtype=np.float32)
+    days_to_target = np.full(n_paths, np.inf, dtype=np.float32)
+    
+    samples = {name: np.empty((weeks + 1, n_paths), dtype=np.float32) for name in ('gained_xp', 'body_fat', 'weight')}
+    samples['gained_xp'][0] = 0
+    samples['body_fat'][0] = inputs['body_fat']
+    samples['weight'][0] = inputs['weight']
+    
+    for week in range(1, weeks + 1):
+        sessions = np.zeros(n_paths, dtype=np.float32)
+        for day in range(7):
+            weekday = (inputs['start_weekday'] + (week - 1) * 7 + day + 1) % 7
+            done = rng.random(n_paths, dtype=np.float32) < adherence
+            gained_xp += done * daily_xp[weekday]
+            if training_days[weekday]:
+                sessions += done
+        gained_xp += 7 * inputs['food_xp']
+        
+        # Weekly energy balance; daily intake noise sums to sd * sqrt(7)
+        intake = 7 * (inputs['intake_mean'] + intake_bias) + rng.normal(0, inputs['intake_sd'] * 7 ** 0.5, n_paths).astype(np.float32)
+        burn = 7 * tdee_per_kg * weight + sessions * WORKOUT_BURN
+        change = (intake - burn) / KCAL_PER_KG
+        previous_bf = fat_mass / weight * 100
+        weight += change
+        fat_mass = np.maximum(fat_mass + change * FAT_FRACTION, 0)
+        body_fat = fat_mass / weight * 100
+        
+        # Interpolate the day within the week the target was crossed
+        crossed = np.isinf(days_to_target) & (body_fat <= TARGET_BODY_FAT)
+        span = np.maximum(previous_bf[crossed] - body_fat[crossed], 1e-6)
+        days_to_target[crossed] = (week - 1) * 7 + 7 * (previous_bf[crossed] - TARGET_BODY_FAT) / span
+        
+        samples['gained_xp'][week] = gained_xp
+        samples['body_fat'][week] = body_fat
+        samples['weight'][week] = weight
+    
+    samples['days_to_target'] = days_to_target
+    return samples